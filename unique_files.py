@@ -7,82 +7,251 @@ Optionally, you can compare by file content (hash) to detect duplicates with dif
 
 import os
 import sys
-from collections import defaultdict
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
 import hashlib
 import argparse
+import array
+import fnmatch
+import mmap
 
-def calculate_file_hash(file_path, chunk_size=8192, hash_algo='md5'):
-    """Calculate hash of a file."""
-    hash_obj = hashlib.new(hash_algo)
+try:
+    from blake3 import blake3
+except ImportError:
+    blake3 = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    from tqdm import tqdm
+except ImportError:
+    tqdm = None
+
+# 1 MiB chunks amortize the Python-level overhead of the read loop.
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# Non-cryptographic hashes are fine here: we only need a dedup heuristic,
+# and blake3/xxh3 are an order of magnitude faster than md5.
+DEFAULT_HASH_ALGO = 'blake3' if blake3 else ('xxh3' if xxhash else 'md5')
+
+# Cheap fingerprint read before committing to a full hash.
+FINGERPRINT_SIZE = 4096
+
+def _new_hash(hash_algo):
+    """Return a fresh hash object for the given algorithm name."""
+    if hash_algo == 'blake3':
+        if blake3 is None:
+            raise RuntimeError("blake3 is not installed (pip install blake3)")
+        return blake3()
+    if hash_algo == 'xxh3':
+        if xxhash is None:
+            raise RuntimeError("xxhash is not installed (pip install xxhash)")
+        return xxhash.xxh3_128()
+    return hashlib.new(hash_algo)
+
+def _scandir_recursive(path, follow_symlinks=False, exclude=()):
+    """Yield os.DirEntry objects for all non-hidden files under path.
+
+    Uses os.scandir so file type checks come from cached DirEntry metadata
+    instead of extra stat() calls per file. Hidden entries and names
+    matching any of the exclude globs are skipped before descending, so
+    whole subtrees (.git, node_modules, __pycache__, ...) are pruned
+    rather than walked and filtered afterwards.
+    """
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.name.startswith('.'):
+                    continue
+                if exclude and any(fnmatch.fnmatch(entry.name, pattern) for pattern in exclude):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    yield from _scandir_recursive(entry.path, follow_symlinks, exclude)
+                elif entry.is_file(follow_symlinks=False) or (follow_symlinks and entry.is_symlink()):
+                    yield entry
+    except PermissionError as e:
+        print(f"Warning: Could not read {path}: {e}", file=sys.stderr)
+
+def calculate_file_hash(file_path, chunk_size=DEFAULT_CHUNK_SIZE, hash_algo=DEFAULT_HASH_ALGO):
+    """Calculate hash of a file.
+
+    Files of at least chunk_size are memory-mapped and hashed in a single
+    update() call, so the hasher walks one contiguous buffer in C instead
+    of looping over reads in Python. Smaller files go through
+    hashlib.file_digest (Python 3.11+), which runs the read loop in C
+    with a reused buffer.
+    """
     try:
         with open(file_path, 'rb') as f:
-            while chunk := f.read(chunk_size):
-                hash_obj.update(chunk)
+            if os.fstat(f.fileno()).st_size >= chunk_size:
+                hash_obj = _new_hash(hash_algo)
+                if hasattr(os, 'posix_fadvise'):
+                    os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    hash_obj.update(mm)
+            elif hasattr(hashlib, 'file_digest'):
+                hash_obj = hashlib.file_digest(f, partial(_new_hash, hash_algo))
+            else:
+                hash_obj = _new_hash(hash_algo)
+                while chunk := f.read(chunk_size):
+                    hash_obj.update(chunk)
         return hash_obj.hexdigest()
     except (OSError, PermissionError) as e:
         print(f"Warning: Could not read {file_path}: {e}", file=sys.stderr)
         return None
 
-def get_files_by_name(directories, follow_symlinks=False):
-    """Return a dict mapping filename -> list of directories containing it."""
-    file_locations = defaultdict(list)
-    
+def walk_once(directories, follow_symlinks=False, exclude=(), want_sizes=False):
+    """Scan every directory exactly once and return parallel file records.
+
+    directories must already be resolved paths; the caller resolves once
+    instead of paying the readlink-per-component cost of resolve() here.
+
+    Returns (paths, names, dir_indexes, sizes, scanned_dirs): record i is
+    the file paths[i] with basename names[i], found under
+    scanned_dirs[dir_indexes[i]]. sizes[i] is its st_size when want_sizes
+    is true (skipped otherwise, since it costs a stat per file). Flat
+    parallel arrays keep per-file cost to plain appends instead of a
+    record object per file.
+    """
+    paths = []
+    names = []
+    dir_indexes = array.array('i')
+    sizes = array.array('q')
+    scanned_dirs = []
+
     for dir_path in directories:
-        dir_path = Path(dir_path).resolve()
-        if not dir_path.is_dir():
+        if not os.path.isdir(dir_path):
             print(f"Error: '{dir_path}' is not a directory or does not exist.", file=sys.stderr)
             continue
-        
-        for file_path in dir_path.rglob('*'):
-            if file_path.name.startswith('.'):
-                continue
-            if file_path.is_file() or (follow_symlinks and file_path.is_symlink()):
-                file_locations[file_path.name].append(dir_path)
-    
-    return file_locations
+        dir_index = len(scanned_dirs)
+        scanned_dirs.append(dir_path)
 
-def get_files_by_content(directories, chunk_size=8192):
-    """Return a dict mapping file hash -> list of (path, directory) tuples."""
-    content_map = defaultdict(list)
-    
-    for dir_path in directories:
-        dir_path = Path(dir_path).resolve()
-        if not dir_path.is_dir():
+        for entry in _scandir_recursive(dir_path, follow_symlinks, exclude):
+            if want_sizes:
+                try:
+                    sizes.append(entry.stat(follow_symlinks=follow_symlinks).st_size)
+                except OSError as e:
+                    print(f"Warning: Could not stat {entry.path}: {e}", file=sys.stderr)
+                    continue
+            paths.append(entry.path)
+            names.append(entry.name)
+            dir_indexes.append(dir_index)
+
+    return paths, names, dir_indexes, sizes, scanned_dirs
+
+def get_files_by_name(directories, follow_symlinks=False, exclude=()):
+    """Return parallel lists of scanned directories and their filename sets."""
+    _, names, dir_indexes, _, scanned_dirs = walk_once(directories, follow_symlinks, exclude)
+
+    per_dir_names = [set() for _ in scanned_dirs]
+    for name, dir_index in zip(names, dir_indexes):
+        # Intern so repeated filenames (__init__.py, README.md, ...)
+        # share a single str object across directories.
+        per_dir_names[dir_index].add(sys.intern(name))
+
+    return scanned_dirs, per_dir_names
+
+def _read_head(file_path, head_size=FINGERPRINT_SIZE):
+    """Read the first head_size bytes of a file, or None on error."""
+    try:
+        with open(file_path, 'rb') as f:
+            return f.read(head_size)
+    except (OSError, PermissionError) as e:
+        print(f"Warning: Could not read {file_path}: {e}", file=sys.stderr)
+        return None
+
+def get_files_by_content(directories, chunk_size=DEFAULT_CHUNK_SIZE, hash_algo=DEFAULT_HASH_ALGO, jobs=None,
+                         follow_symlinks=False, exclude=()):
+    """Return a list of (content_key, path, directory) records sorted by key.
+
+    Files sharing a content_key have identical content; files proven
+    unique get a synthetic per-file key instead of a digest. A flat
+    sorted list is returned instead of a key -> list dict because most
+    keys are singletons, and a dict of one-element lists roughly doubles
+    peak memory on large trees. Callers group with itertools.groupby.
+
+    Files that cannot have a duplicate are weeded out cheaply before any
+    full read: first by size (from the scandir stat, essentially free),
+    then by their first 4 KiB. Only files that still collide on
+    (size, head bytes) get a full content hash.
+
+    Hashing runs on a thread pool: hashlib and file reads release the GIL,
+    so threads overlap both I/O and hash compute.
+    """
+    records = []
+
+    paths, _, dir_indexes, sizes, scanned_dirs = walk_once(directories, follow_symlinks, exclude, want_sizes=True)
+
+    def record_unique(index):
+        records.append((f'unique:{paths[index]}', paths[index], scanned_dirs[dir_indexes[index]]))
+
+    size_map = defaultdict(list)
+    for index, size in enumerate(sizes):
+        size_map[size].append(index)
+
+    to_hash = []
+    for group in size_map.values():
+        if len(group) == 1:
+            record_unique(group[0])
             continue
-            
-        for file_path in dir_path.rglob('*'):
-            if file_path.name.startswith('.'):
-                continue
-            if not file_path.is_file():
-                continue
-            file_hash = calculate_file_hash(file_path, chunk_size)
+        head_map = defaultdict(list)
+        for index in group:
+            head = _read_head(paths[index])
+            if head is not None:
+                head_map[head].append(index)
+        for head_group in head_map.values():
+            if len(head_group) == 1:
+                record_unique(head_group[0])
+            else:
+                to_hash.extend(head_group)
+
+    if jobs is None:
+        jobs = min(32, (os.cpu_count() or 1) * 2)
+
+    hash_one = partial(calculate_file_hash, chunk_size=chunk_size, hash_algo=hash_algo)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(hash_one, paths[index]): index for index in to_hash}
+        completed = as_completed(futures)
+        if tqdm is not None:
+            completed = tqdm(completed, total=len(futures), desc='Hashing', unit='file')
+        for future in completed:
+            index = futures[future]
+            file_hash = future.result()
             if file_hash:
-                content_map[file_hash].append((file_path, dir_path))
-    
-    return content_map
+                records.append((file_hash, paths[index], scanned_dirs[dir_indexes[index]]))
 
-def print_unique_by_name(directories):
-    file_locations = get_files_by_name(directories)
-    
-    # Invert to get files unique to each directory
-    unique_files = defaultdict(list)
-    
-    for filename, dirs_containing in file_locations.items():
-        if len(dirs_containing) == 1:
-            unique_dir = dirs_containing[0]
-            unique_files[unique_dir].append(filename)
-    
-    # Print results
-    print("Files unique to each directory (by filename):\n")
-    for dir_path in sorted(unique_files.keys(), key=lambda x: x.name):
-        files = sorted(unique_files[dir_path])
-        print(f"{dir_path}/  ({len(files)} unique files)")
-        for f in files[:50]:  # limit preview
-            print(f"   - {f}")
+    records.sort(key=itemgetter(0))
+    return records
+
+def print_unique_by_name(directories, follow_symlinks=False, exclude=()):
+    scanned_dirs, per_dir_names = get_files_by_name(directories, follow_symlinks, exclude)
+
+    # A name is unique to a directory iff it appears in exactly one
+    # directory's name set.
+    total = Counter()
+    for name_set in per_dir_names:
+        total.update(name_set)
+
+    # Print results in one write instead of one syscall per line
+    lines = ["Files unique to each directory (by filename):", ""]
+    for dir_path, name_set in sorted(zip(scanned_dirs, per_dir_names),
+                                     key=lambda pair: os.path.basename(pair[0])):
+        files = sorted(name for name in name_set if total[name] == 1)
+        if not files:
+            continue
+        lines.append(f"{dir_path}/  ({len(files)} unique files)")
+        lines.extend(f"   - {f}" for f in files[:50])  # limit preview
         #if len(files) > 50:
-        #    print(f"   ... and {len(files) - 50} more")
-        print()
+        #    lines.append(f"   ... and {len(files) - 50} more")
+        lines.append("")
+    sys.stdout.write("\n".join(lines) + "\n")
 
 def main():
     parser = argparse.ArgumentParser(description="Find files unique to each directory.")
@@ -90,54 +259,65 @@ def main():
     parser.add_argument('--by-content', action='store_true',
                         help='Compare by file content (hash) instead of just filename (slower but more accurate)')
     parser.add_argument('--follow-symlinks', action='store_true',
-                        help='Include symlinked files when comparing by name')
-    
+                        help='Include symlinked files in the comparison')
+    parser.add_argument('--hash-algo', choices=['md5', 'blake3', 'xxh3'], default=DEFAULT_HASH_ALGO,
+                        help=f'Hash algorithm for content comparison (default: {DEFAULT_HASH_ALGO})')
+    parser.add_argument('--jobs', type=int, default=None, metavar='N',
+                        help='Number of hashing threads for --by-content (default: 2x CPU count, capped at 32)')
+    parser.add_argument('--exclude', action='append', default=[], metavar='PATTERN',
+                        help='Skip files/directories matching this shell glob, pruning whole subtrees '
+                             '(repeatable, e.g. --exclude node_modules --exclude "*.pyc")')
+
     args = parser.parse_args()
+
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be >= 1")
+
+    if (args.hash_algo == 'blake3' and blake3 is None) or (args.hash_algo == 'xxh3' and xxhash is None):
+        package = 'blake3' if args.hash_algo == 'blake3' else 'xxhash'
+        print(f"Error: --hash-algo {args.hash_algo} requires the '{package}' package (pip install {package}).", file=sys.stderr)
+        sys.exit(1)
     
     if len(args.directories) < 2:
         print("Error: Please provide at least 2 directories to compare.", file=sys.stderr)
         sys.exit(1)
     
-    directories = [Path(d) for d in args.directories]
-    
+    # Resolve once here; the traversal helpers expect resolved paths.
+    resolved_dirs = [(d, str(Path(d).resolve())) for d in args.directories]
+    directories = [resolved for _, resolved in resolved_dirs]
+
     if args.by_content:
         print("Comparing files by content (this may take a while)...")
-        content_map = get_files_by_content(directories)
-        
-        # Track which files have duplicates across directories
-        seen_in_multiple = set()
-        for locations in content_map.values():
-            dirs = {path.parent for path, _ in locations}
-            if len(dirs) > 1:
-                for file_path, _ in locations:
-                    seen_in_multiple.add(file_path)
-        
-        print("\nFiles unique to each directory (by content):\n")
-        for dir_path in directories:
-            unique_files = []
-            for file_path in dir_path.rglob('*'):
-                if file_path.name.startswith('.'):
-                    continue
-                if not file_path.is_file():
-                    continue
-                if file_path not in seen_in_multiple:
-                    file_hash = calculate_file_hash(file_path)
-                    # Double-check this file isn't duplicated under different name
-                    if file_hash and len({p.parent for p, _ in content_map[file_hash]}) == 1:
-                        unique_files.append(file_path.name)
-            
+        records = get_files_by_content(directories, hash_algo=args.hash_algo, jobs=args.jobs,
+                                       follow_symlinks=args.follow_symlinks, exclude=args.exclude)
+
+        # A file is unique to a directory iff its content key only ever
+        # appears under that directory.
+        unique_in_dir = {resolved: [] for _, resolved in resolved_dirs}
+        for _, group in groupby(records, key=itemgetter(0)):
+            names = []
+            dirs = set()
+            for _, path, dir_str in group:
+                names.append(os.path.basename(path))
+                dirs.add(dir_str)
+            if len(dirs) == 1:
+                unique_in_dir[dirs.pop()].extend(names)
+
+        lines = ["", "Files unique to each directory (by content):", ""]
+        for dir_path, resolved in resolved_dirs:
+            unique_files = unique_in_dir[resolved]
+
             if unique_files:
-                print(f"{dir_path}/  ({len(unique_files)} unique files by content)")
-                for f in sorted(unique_files)[:50]:
-                    print(f"   - {f}")
+                lines.append(f"{dir_path}/  ({len(unique_files)} unique files by content)")
+                lines.extend(f"   - {f}" for f in sorted(unique_files)[:50])
                 if len(unique_files) > 50:
-                    print(f"   ... and {len(unique_files) - 50} more")
-                print()
+                    lines.append(f"   ... and {len(unique_files) - 50} more")
             else:
-                print(f"{dir_path}/  (no unique files by content)")
-                print()
+                lines.append(f"{dir_path}/  (no unique files by content)")
+            lines.append("")
+        sys.stdout.write("\n".join(lines) + "\n")
     else:
-        print_unique_by_name(directories)
+        print_unique_by_name(directories, follow_symlinks=args.follow_symlinks, exclude=args.exclude)
 
 if __name__ == "__main__":
     main()